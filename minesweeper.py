@@ -1,6 +1,47 @@
+import functools
 import itertools
 import random
 
+from collections import deque
+
+
+@functools.lru_cache(maxsize=None)
+def _board_tables(height, width):
+    """
+    Returns lookup tables that depend only on the size of the board,
+    built once and shared by every game and AI of that size:
+        - neighbors: neighbors[i][j] lists the cells within one row and
+          column of (i, j), not including (i, j) itself
+        - cell_to_bit: the bit standing for each cell, see Sentence
+        - bit_to_cell: the reverse of cell_to_bit
+        - neighbor_mask: the bitmask of the neighbors of each cell
+
+    The tables are shared, so they must not be modified.
+    """
+    neighbors = []
+    cell_to_bit = {}
+    bit_to_cell = {}
+    neighbor_mask = {}
+    for i in range(height):
+        row = []
+        for j in range(width):
+            row.append([
+                (ni, nj)
+                for ni in range(max(0, i - 1), min(height, i + 2))
+                for nj in range(max(0, j - 1), min(width, j + 2))
+                if (ni, nj) != (i, j)
+            ])
+            bit = 1 << (i * width + j)
+            cell_to_bit[(i, j)] = bit
+            bit_to_cell[bit] = (i, j)
+        neighbors.append(row)
+    for i in range(height):
+        for j in range(width):
+            neighbor_mask[(i, j)] = 0
+            for cell in neighbors[i][j]:
+                neighbor_mask[(i, j)] |= cell_to_bit[cell]
+    return neighbors, cell_to_bit, bit_to_cell, neighbor_mask
+
 
 class Minesweeper():
     """
@@ -14,43 +55,48 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
+        # Initialize an empty field with no mines, one byte per cell
         self.board = []
         for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+            self.board.append(bytearray(self.width))
+
+        # Add mines randomly, drawing distinct cells in one go
+        for p in random.sample(range(self.height * self.width), mines):
+            i, j = divmod(p, self.width)
+            self.mines.add((i, j))
+            self.board[i][j] = 1
 
         # At first, player has found no mines
         self.mines_found = set()
 
+        # Cells within one row and column of each cell
+        self._neighbors = _board_tables(self.height, self.width)[0]
+
+        # Number of nearby mines of every cell, worked out in one pass
+        # over the mines since the board never changes afterwards
+        self._nearby = []
+        for i in range(self.height):
+            self._nearby.append([0] * self.width)
+        for i, j in self.mines:
+            for ni, nj in self._neighbors[i][j]:
+                self._nearby[ni][nj] += 1
+
     def print(self):
         """
         Prints a text-based representation
         of where mines are located.
         """
-        for i in range(self.height):
-            print("--" * self.width + "-")
-            for j in range(self.width):
-                if self.board[i][j]:
-                    print("|X", end="")
-                else:
-                    print("| ", end="")
-            print("|")
-        print("--" * self.width + "-")
+        separator = "--" * self.width + "-"
+        lines = []
+        for row in self.board:
+            lines.append(separator)
+            lines.append("".join("|X" if mine else "| " for mine in row) + "|")
+        lines.append(separator)
+        print("\n".join(lines))
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i][j])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +104,15 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return self._nearby[i][j]
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+    def all_nearby_mines(self):
+        """
+        Returns a grid holding, for every cell on the board,
+        the number of mines within one row and column of it.
+        """
+        return [row[:] for row in self._nearby]
 
     def won(self):
         """
@@ -89,23 +126,64 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The cells are stored as a bitmask, with cell (i, j) on bit
+    i * width + j, so set operations on sentences are integer operations.
+    `cells` may be given as an iterable of cells or as such a bitmask.
     """
 
-    def __init__(self, cells, count):
-        self.cells = set(cells)
+    def __init__(self, cells, count, height, width):
+        self.height = height
+        self.width = width
+        if isinstance(cells, int):
+            self.mask = cells
+        else:
+            self.mask = 0
+            for cell in cells:
+                self.mask |= self.bit(cell)
         self.count = count
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return self.mask == other.mask and self.count == other.count
+
+    def __hash__(self):
+        return hash((self.mask, self.count))
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    @property
+    def cells(self):
+        """
+        The set of cells in the sentence, built afresh from the bitmask
+        on every access; change the sentence through mark_mine/mark_safe.
+        """
+        cells = set()
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            cells.add(divmod(low.bit_length() - 1, self.width))
+            mask ^= low
+        return cells
+
+    def bit(self, cell):
+        """
+        Returns the bit standing for `cell`.
+
+        Raises ValueError if the cell is off the board.
+        """
+        i, j = cell
+        if not (0 <= i < self.height and 0 <= j < self.width):
+            raise ValueError(
+                f"{cell} is off the {self.height}x{self.width} board"
+            )
+        return 1 << (i * self.width + j)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count:
+        if self.mask.bit_count() == self.count:
             return self.cells
         else:
             return None
@@ -122,8 +200,9 @@ class Sentence():
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
             self.count -= 1
 
     def mark_safe(self, cell):
@@ -131,8 +210,7 @@ class Sentence():
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        self.mask &= ~self.bit(cell)
 
 
 class MinesweeperAI():
@@ -153,26 +231,54 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # The same two sets as bitmasks, see Sentence
+        self.mines_mask = 0
+        self.safes_mask = 0
+
+        # Cells known to be safe that have not been clicked on yet
+        self._safe_unplayed = set()
+
+        # Sentences about the game known to be true, keyed by their
+        # (mask, count) so that no sentence is ever stored twice
+        self.knowledge = {}
+
+        # Bit standing for each cell in sentence masks, the reverse,
+        # and the bitmask of the on-board neighbors of each cell
+        _, self._cell_to_bit, self._bit_to_cell, self._neighbor_mask = (
+            _board_tables(self.height, self.width)
+        )
+
+        # Cells a random move may pick; cells that have since been played
+        # or found to be mines are only weeded out when they get drawn
+        self._candidates = list(self._cell_to_bit)
+
+        # Forced mines and safes of each group of sentences searched by
+        # the last call to _forced, keyed by the group's (mask, count) pairs
+        self._inference_cache = {}
+
+        # Keys in self.knowledge of the sentences mentioning each cell,
+        # keyed by the cell's bit
+        self._cell_index = {}
 
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
+        bit = self._bit(cell)
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self._propagate(self._settle(bit, 0))
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        bit = self._bit(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.moves_made:
+            self._safe_unplayed.add(cell)
+        self._propagate(self._settle(0, bit))
 
     def add_knowledge(self, cell, count):
         """
@@ -189,71 +295,312 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        bit = self._bit(cell)
         self.moves_made.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
-        i = cell[0]
-        j = cell[1]
-        if count != 0:
-            self.knowledge.append(Sentence([(i-1, j+1), (i, j+1), (i+1, j+1), (i-1, j), (i+1, j), (i-1, j-1), (i, j-1), (i+1, j-1)], count))
-            change = True
-            while (change == True) and (len(self.knowledge) != 1):
-                change = False            
-                for x in range(len(self.knowledge)):
-                    for y in range(len(self.knowledge)):
-                        # Creates new sentances with the knowledge pairs
-                        s1 = self.knowledge[x]
-                        s2 = self.knowledge[y]
-                        if (s2.cells.issubset(s1.cells)) or (s1.cells.issubset(s2.cells)):
-                            s = s2.cells.symmetric_difference(s1.cells)
-                            c = abs(s2.count - s1.count)
-                            if self.knowledge.count(Sentence(s, c)) == 0:
-                                self.knowledge.append(Sentence(s, c))
-                                change = True
-                
-                # Remove elements from the sentences if they are known to be safe
-                for x in range(len(self.knowledge)):
-                    s = self.knowledge[x].cells
-                    s = list(s)
-                    for ele in s:
-                        if ele in self.safes:
-                            self.knowledge[x].cells.remove(ele)
-
-                # Remove elements from the sentences if they are known to be a mine
-                for x in range(len(self.knowledge)):
-                    s = self.knowledge[x].cells
-                    s = list(s)
-                    for ele in s:
-                        if ele in self.mines:
-                            self.knowledge[x].cells.remove(ele)
-                            self.knowledge[x].count -= 1                    
+        self._safe_unplayed.discard(cell)
+        pending = self._settle(0, bit)
+
+        # The new sentence leaves out neighbors that are already known;
+        # every move made has been marked safe, so that covers those too
+        neighbors = self._neighbor_mask[cell]
+        mask = neighbors & ~(self.safes_mask | self.mines_mask)
+        count -= (neighbors & self.mines_mask).bit_count()
+
+        # A new sentence whose cells are all mines or all safe
+        # settles them without joining the knowledge base
+        mines = safes = 0
+        if count == 0:
+            safes = mask
+        elif count == mask.bit_count():
+            mines = mask
+        elif self._add_sentence(mask, count):
+            pending.append((mask, count))
+
+        # Follow the subset rule as far as it goes, then settle whatever
+        # the search over assignments finds. The search sees every
+        # consistent assignment, so settling what it finds cannot force
+        # any more cells and it need only run once
+        self._propagate(pending, mines, safes)
+        mines, safes = self._forced()
+        if mines | safes:
+            self._propagate(self._settle(mines, safes))
+
+    def _propagate(self, pending, mines=0, safes=0):
+        """
+        Runs the subset rule from the sentences with the `pending` keys,
+        settling the cells in `mines` and `safes` and every cell it finds,
+        and going again from the sentences that shrink as a result until
+        nothing new follows.
+        """
+        while True:
+            inferred_mines, inferred_safes = self._infer(pending)
+            mines |= inferred_mines
+            safes |= inferred_safes
+            if not mines | safes:
+                return
+            pending = self._settle(mines, safes)
+            mines = safes = 0
+
+    def _settle(self, mines, safes):
+        """
+        Marks the cells in the `mines` and `safes` bitmasks as mines and
+        as safe, and removes them from every sentence, returning the
+        keys of the sentences that shrank.
+        """
+        mines &= ~self.mines_mask
+        safes &= ~self.safes_mask
+        if not mines | safes:
+            return []
+        self.mines |= self._cells(mines)
+        self.mines_mask |= mines
+        new_safes = self._cells(safes)
+        self.safes |= new_safes
+        self.safes_mask |= safes
+        self._safe_unplayed |= new_safes - self.moves_made
+        return self._strip(mines, safes)
+
+    def _strip(self, mines, safes):
+        """
+        Removes the cells in the `mines` and `safes` bitmasks from every
+        sentence, returning the keys of the sentences that shrank.
 
-        else:
-            
-            temp = []
+        A sentence that runs out of cells, or that shrinks into one that
+        is already known, is dropped from the knowledge base.
+        """
+        # Only sentences indexed under one of the cells can shrink, and
+        # no sentence will hold those cells again
+        keys = set()
+        for bit in self._bits(mines | safes):
+            keys |= self._cell_index.pop(bit, set())
+
+        changed = []
+        for key in keys:
+            sentence = self.knowledge.pop(key)
+            sentence.mask &= ~safes
+            removed = sentence.mask & mines
+            sentence.mask ^= removed
+            sentence.count -= removed.bit_count()
+
+            # File what is left of the sentence under its new key
+            for bit in self._bits(sentence.mask):
+                self._cell_index[bit].discard(key)
+            if self._add_sentence(sentence.mask, sentence.count, sentence):
+                changed.append((sentence.mask, sentence.count))
+        return changed
+
+    def _forced(self, budget=20000):
+        """
+        Returns a pair of bitmasks: the cells that are a mine, and the
+        cells that are safe, in every assignment of mines to cells
+        consistent with the knowledge base.
+
+        The sentences are split into groups that share no cells, and the
+        consistent assignments of each group are searched for one by one.
+        A group whose search takes more than `budget` steps is given up
+        on, so it settles nothing rather than stalling the game. Results
+        are kept for the groups seen, so the next call only searches the
+        groups that have changed in between.
+        """
+        # Group sentences by shared cells
+        groups = []
+        for key in self.knowledge:
+            mask, sentences = key[0], [key]
+            rest = []
+            for group in groups:
+                if group[0] & mask:
+                    mask |= group[0]
+                    sentences += group[1]
+                else:
+                    rest.append(group)
+            groups = rest + [(mask, sentences)]
+
+        # Groups left untouched since the last call are looked up
+        # instead of searched again; any that changed have a new key
+        cache = {}
+        forced_mines = forced_safes = 0
+        for cells, sentences in groups:
+            key = frozenset(sentences)
+            if key in self._inference_cache:
+                mines, safes = self._inference_cache[key]
+            else:
+                # Cells that are a mine in every assignment found so far,
+                # cells that are a mine in some, and the steps taken
+                found = [cells, 0, 0]
+                self._search(sentences, 0, cells, found, budget)
+                always, ever, steps = found
+                mines = safes = 0
+                if steps <= budget and (ever or always != cells):
+                    mines = always
+                    safes = cells & ~ever
+            cache[key] = (mines, safes)
+            forced_mines |= mines
+            forced_safes |= safes
+        self._inference_cache = cache
+
+        return forced_mines, forced_safes
+
+    def _search(self, sentences, mines, cells, found, budget):
+        """
+        Visits every assignment of mines to `cells` that extends `mines`
+        and satisfies the (mask, count) pairs in `sentences`, recording
+        it in `found` as described in _forced.
+
+        Returns False once the search can stop early.
+        """
+        found[2] += 1
+        if found[2] > budget:
+            return False
+
+        # Any sentence whose cells are all mines or all safe
+        # decides those cells straight away
+        while True:
+            new_mines = new_safes = 0
+            for mask, count in sentences:
+                size = mask.bit_count()
+                if count < 0 or count > size:
+                    return True
+                if count == 0:
+                    new_safes |= mask
+                elif count == size:
+                    new_mines |= mask
+            if new_mines & new_safes:
+                return True
+            if not new_mines | new_safes:
+                break
+            mines |= new_mines
+            sentences = [
+                (mask & ~(new_mines | new_safes),
+                 count - (mask & new_mines).bit_count())
+                for mask, count in sentences
+            ]
+        sentences = [(mask, count) for mask, count in sentences if mask]
+
+        if not sentences:
+            found[0] &= mines
+            found[1] |= mines
+
+            # Nothing can be forced once every cell has been
+            # seen both as a mine and as safe
+            return found[0] != 0 or found[1] != cells
+
+        # Otherwise try a cell of the smallest sentence as a mine, then
+        # as safe, as that sentence is the quickest to run out of choices
+        smallest = min(sentences, key=lambda sentence: sentence[0].bit_count())
+        bit = smallest[0] & -smallest[0]
+        if not self._search([
+            (mask & ~bit, count - 1) if mask & bit else (mask, count)
+            for mask, count in sentences
+        ], mines | bit, cells, found, budget):
+            return False
+        return self._search([
+            (mask & ~bit, count) for mask, count in sentences
+        ], mines, cells, found, budget)
+
+    def _bit(self, cell):
+        """
+        Returns the bit standing for `cell`.
+
+        Raises ValueError if the cell is off the board.
+        """
+        try:
+            return self._cell_to_bit[cell]
+        except KeyError:
+            raise ValueError(
+                f"{cell} is off the {self.height}x{self.width} board"
+            ) from None
+
+    def _bits(self, mask):
+        """
+        Yields each set bit of `mask` as a mask of its own.
+        """
+        while mask:
+            low = mask & -mask
+            yield low
+            mask ^= low
 
-            temp.append((i-1, j+1))
-            temp.append((i, j+1))
-            temp.append((i+1, j+1))
-            temp.append((i-1, j))
-            temp.append((i+1, j))
-            temp.append((i-1, j-1))
-            temp.append((i, j-1))
-            temp.append((i+1, j-1))
+    def _cells(self, mask):
+        """
+        Returns the set of cells whose bits are set in `mask`.
+        """
+        return {self._bit_to_cell[bit] for bit in self._bits(mask)}
 
-            for i in temp:
-                if (i[0] >= 0) and (i[0] <= 7) and (i[1] >= 0) and (i[1] <= 7):
-                    self.safes.add(i)
+    def _add_sentence(self, mask, count, sentence=None):
+        """
+        Adds the sentence that exactly `count` of the cells in `mask` are
+        mines to the knowledge base, reusing `sentence` if given, and
+        records it under each of its cells.
 
-            del temp
+        Returns False, adding nothing, if the sentence has no cells
+        or is already known.
+        """
+        key = (mask, count)
+        if not mask or key in self.knowledge:
+            return False
+        if sentence is None:
+            sentence = Sentence(mask, count, self.height, self.width)
+        self.knowledge[key] = sentence
+        for bit in self._bits(mask):
+            self._cell_index.setdefault(bit, set()).add(key)
+        return True
+
+    def _infer(self, pending):
+        """
+        Adds every sentence that can be inferred by the subset rule,
+        starting from the sentences with the given knowledge base keys.
+
+        Only sentences sharing a cell with a pending sentence are looked
+        at, and only newly inferred sentences are queued up again, so
+        the knowledge base is never rescanned pair by pair.
 
-        # Mark any new mines if the sentence explicitly says so
-        for s in self.knowledge:
-            if len(s.cells) == s.count:
-                l = list(s.cells)
-                for x in l:
-                    self.mines.add(x)
+        Inferred sentences whose cells are all mines or all safe are not
+        added; their cells are returned instead, as a pair of bitmasks
+        of the mines and the safes found, along with those of any pending
+        sentence that has become all mines or all safe.
+        """
+        mines = safes = 0
+        queue = deque(pending)
+        while queue:
+            x = queue.popleft()
+            s1 = self.knowledge.get(x)
+            if s1 is None:
+                continue
+
+            # A sentence that shrank may now be all mines or all safe
+            if s1.count == 0:
+                safes |= s1.mask
+                continue
+            if s1.count == s1.mask.bit_count():
+                mines |= s1.mask
+                continue
+
+            # Candidate partners are the sentences sharing a cell with s1
+            candidates = set()
+            for bit in self._bits(s1.mask):
+                candidates |= self._cell_index.get(bit, set())
+            candidates.discard(x)
+
+            for y in candidates:
+                # Creates new sentances with the knowledge pairs; one
+                # intersection tells whether either contains the other
+                s2 = self.knowledge[y]
+                overlap = s1.mask & s2.mask
+                if overlap == s2.mask:
+                    c = s1.count - s2.count
+                elif overlap == s1.mask:
+                    c = s2.count - s1.count
+                else:
+                    continue
+                s = s1.mask ^ s2.mask
+                if not s or (s, c) in self.knowledge:
+                    continue
+                if c == 0:
+                    safes |= s
+                elif c == s.bit_count():
+                    mines |= s
+                elif self._add_sentence(s, c):
+                    queue.append((s, c))
 
+        return mines, safes
 
     def make_safe_move(self):
         """
@@ -264,18 +611,11 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        
-        # return an element from a list of safe cells that is not in the moves made set
-        if len(self.safes) > 1:
-            l = list(self.safes)
-            for ele in l:
-                if ele not in self.moves_made:
-                    self.moves_made.add(ele)
-                    return ele
-            return None
-        else:
-            return None
-        
+        move = next(iter(self._safe_unplayed), None)
+        if move is not None:
+            self._safe_unplayed.discard(move)
+            self.moves_made.add(move)
+        return move
 
     def make_random_move(self):
         """
@@ -285,14 +625,19 @@ class MinesweeperAI():
             2) are not known to be mines
         """
 
-        if (len(self.safes) > 0) and (not self.safes.issubset(self.moves_made)):
-            while True:
-                move = random.sample(self.safes, 1)[0]
-                if (move not in self.moves_made) and (move not in self.mines):
-                    return move
-        else:
-            while True:
-                i = random.randrange(0, 8)
-                j = random.randrange(0, 8)
-                if ((i, j) not in self.moves_made) and ((i, j) not in self.mines):
-                    return (i, j)
+        # A known safe cell is always the better random pick
+        if self._safe_unplayed:
+            return random.choice(tuple(self._safe_unplayed))
+
+        candidates = self._candidates
+        while candidates:
+            x = random.randrange(len(candidates))
+            move = candidates[x]
+            if move not in self.moves_made and move not in self.mines:
+                return move
+
+            # Stale entry: swap it to the end and drop it
+            candidates[x] = candidates[-1]
+            candidates.pop()
+
+        return None
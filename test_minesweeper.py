@@ -0,0 +1,197 @@
+import random
+import unittest
+
+from minesweeper import Minesweeper, MinesweeperAI, Sentence
+
+
+class SentenceTest(unittest.TestCase):
+    """
+    Tests for Sentence, which keeps its cells as a bitmask but still
+    hands out and takes sets of cells.
+    """
+
+    def test_off_board_cell_is_rejected(self):
+        sentence = Sentence({(0, 0)}, 0, 5, 9)
+        for cell in [(-1, 0), (5, 0), (0, -1), (0, 9)]:
+            with self.assertRaises(ValueError):
+                sentence.bit(cell)
+        with self.assertRaises(ValueError):
+            Sentence({(0, 9), (1, 2)}, 1, 8, 8)
+
+    def test_known_mines_and_safes_are_sets_of_cells(self):
+        cells = {(0, 8), (4, 0), (2, 3)}
+        self.assertEqual(Sentence(cells, 3, 5, 9).known_mines(), cells)
+        self.assertEqual(Sentence(cells, 0, 5, 9).known_safes(), cells)
+        self.assertIsNone(Sentence(cells, 1, 5, 9).known_mines())
+        self.assertIsNone(Sentence(cells, 1, 5, 9).known_safes())
+
+    def test_mark_mine_and_mark_safe_update_cells(self):
+        sentence = Sentence({(0, 8), (4, 0), (2, 3)}, 2, 5, 9)
+        sentence.mark_mine((0, 8))
+        self.assertEqual((sentence.cells, sentence.count), ({(4, 0), (2, 3)}, 1))
+        sentence.mark_safe((4, 0))
+        self.assertEqual((sentence.cells, sentence.count), ({(2, 3)}, 1))
+
+        # Cells outside the sentence leave it alone
+        sentence.mark_mine((1, 1))
+        sentence.mark_safe((1, 1))
+        self.assertEqual((sentence.cells, sentence.count), ({(2, 3)}, 1))
+        self.assertEqual(sentence.known_mines(), {(2, 3)})
+
+
+class ForcedTest(unittest.TestCase):
+    """
+    Tests for MinesweeperAI._forced, which finds the cells that are a
+    mine, or safe, in every assignment consistent with the knowledge base.
+    """
+
+    def setUp(self):
+        self.ai = MinesweeperAI(height=3, width=5)
+
+    def mask(self, *cells):
+        mask = 0
+        for cell in cells:
+            mask |= self.ai._cell_to_bit[cell]
+        return mask
+
+    def add(self, cells, count):
+        self.assertTrue(self.ai._add_sentence(self.mask(*cells), count))
+
+    def add_one_two_one(self):
+        # 1-2-1 against the top wall: the revealed cells below (0, 0),
+        # (0, 1) and (0, 2) see 1, 2 and 1 of them as mines
+        self.add([(0, 0), (0, 1)], 1)
+        self.add([(0, 0), (0, 1), (0, 2)], 2)
+        self.add([(0, 1), (0, 2)], 1)
+
+    def test_one_two_one_forces_mines_and_safe(self):
+        self.add_one_two_one()
+        mines, safes = self.ai._forced()
+        self.assertEqual(mines, self.mask((0, 0), (0, 2)))
+        self.assertEqual(safes, self.mask((0, 1)))
+
+    def test_separate_groups_are_settled_together(self):
+        self.add_one_two_one()
+        self.add([(2, 3), (2, 4)], 2)
+        mines, safes = self.ai._forced()
+        self.assertEqual(mines, self.mask((0, 0), (0, 2), (2, 3), (2, 4)))
+        self.assertEqual(safes, self.mask((0, 1)))
+
+    def test_nothing_forced(self):
+        self.add([(0, 0), (0, 1)], 1)
+        self.add([(1, 0), (1, 1), (1, 2)], 1)
+        self.assertEqual(self.ai._forced(), (0, 0))
+
+    def test_inconsistent_group_settles_nothing(self):
+        self.add([(0, 0)], 0)
+        self.add([(0, 0), (0, 1)], 2)
+        self.assertEqual(self.ai._forced(), (0, 0))
+
+    def test_budget_exhausted_group_settles_nothing(self):
+        self.add_one_two_one()
+        self.assertEqual(self.ai._forced(budget=1), (0, 0))
+
+
+class MinesweeperAITest(unittest.TestCase):
+    """
+    Tests for the MinesweeperAI methods runner.py calls.
+    """
+
+    def setUp(self):
+        self.ai = MinesweeperAI(height=5, width=9)
+
+    def test_off_board_cells_are_rejected(self):
+        for cell in [(-1, 0), (5, 0), (0, 9), (9, 9)]:
+            with self.assertRaises(ValueError):
+                self.ai.mark_mine(cell)
+            with self.assertRaises(ValueError):
+                self.ai.mark_safe(cell)
+            with self.assertRaises(ValueError):
+                self.ai.add_knowledge(cell, 0)
+        self.assertEqual(self.ai.mines, set())
+        self.assertEqual(self.ai.safes, set())
+        self.assertEqual(self.ai.moves_made, set())
+        self.assertEqual((self.ai.mines_mask, self.ai.safes_mask), (0, 0))
+        self.assertIsNone(self.ai.make_safe_move())
+
+    def test_single_safe_move_is_made(self):
+        self.ai.mark_safe((2, 4))
+        self.assertEqual(self.ai.make_safe_move(), (2, 4))
+        self.assertIn((2, 4), self.ai.moves_made)
+        self.assertIsNone(self.ai.make_safe_move())
+
+    def sentences(self):
+        return [(s.cells, s.count) for s in self.ai.knowledge.values()]
+
+    def test_corner_sentence_holds_only_on_board_neighbors(self):
+        self.ai.add_knowledge((0, 0), 1)
+        self.assertEqual(self.sentences(), [({(0, 1), (1, 0), (1, 1)}, 1)])
+
+    def test_corner_zero_marks_on_board_neighbors_safe(self):
+        self.ai.add_knowledge((4, 8), 0)
+        self.assertEqual(self.ai.safes, {(4, 8), (3, 7), (3, 8), (4, 7)})
+        self.assertEqual(self.ai.knowledge, {})
+
+    def test_new_sentence_leaves_out_known_cells(self):
+        self.ai.mark_safe((3, 8))
+        self.ai.add_knowledge((4, 8), 1)
+        self.assertEqual(self.sentences(), [({(3, 7), (4, 7)}, 1)])
+
+    def test_new_sentence_count_drops_by_known_mines(self):
+        self.ai.mark_mine((3, 7))
+        self.ai.add_knowledge((4, 8), 1)
+        self.assertEqual(self.ai.knowledge, {})
+        self.assertLessEqual({(3, 8), (4, 7)}, self.ai.safes)
+        self.assertEqual(self.ai.mines, {(3, 7)})
+
+    def test_mark_safe_settles_what_follows(self):
+        a, b = (1, 1), (1, 2)
+        bits = self.ai._cell_to_bit[a] | self.ai._cell_to_bit[b]
+        self.ai._add_sentence(bits, 1)
+        self.ai.mark_safe(a)
+        self.assertEqual(self.ai.mines, {b})
+        self.assertEqual(self.ai.knowledge, {})
+
+    def test_mark_mine_settles_what_follows(self):
+        a, b = (1, 1), (1, 2)
+        bits = self.ai._cell_to_bit[a] | self.ai._cell_to_bit[b]
+        self.ai._add_sentence(bits, 1)
+        self.ai.mark_mine(a)
+        self.assertEqual(self.ai.safes, {b})
+        self.assertEqual(self.ai.knowledge, {})
+
+    def test_random_move_skips_played_cells_and_mines(self):
+        random.seed(0)
+        game = Minesweeper(height=5, width=9, mines=10)
+        for cell in list(game.mines)[:5]:
+            self.ai.mark_mine(cell)
+        for cell in [(0, 0), (4, 8), (2, 4)]:
+            if not game.is_mine(cell):
+                self.ai.add_knowledge(cell, game.nearby_mines(cell))
+        for _ in range(200):
+            move = self.ai.make_random_move()
+            self.assertNotIn(move, self.ai.moves_made)
+            self.assertNotIn(move, self.ai.mines)
+
+    def test_random_move_is_none_once_board_is_used_up(self):
+        random.seed(0)
+        game = Minesweeper(height=5, width=9, mines=10)
+        for cell in game.mines:
+            self.ai.mark_mine(cell)
+        for i in range(5):
+            for j in range(9):
+                if not game.is_mine((i, j)):
+                    self.ai.add_knowledge((i, j), game.nearby_mines((i, j)))
+        self.assertIsNone(self.ai.make_random_move())
+
+    def test_random_move_prefers_known_safe_cells(self):
+        random.seed(0)
+        safes = {(0, 8), (3, 2), (4, 7)}
+        for cell in safes:
+            self.ai.mark_safe(cell)
+        for _ in range(200):
+            self.assertIn(self.ai.make_random_move(), safes)
+
+
+if __name__ == "__main__":
+    unittest.main()